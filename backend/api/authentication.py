@@ -0,0 +1,103 @@
+import copy
+from collections import OrderedDict
+from hashlib import md5
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.cache import bump_version, get_version
+from food.constants import TOKEN_CACHE_SIZE, TOKEN_CACHE_TIMEOUT
+
+
+def get_auth_version_name(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_user_tokens(user_id):
+    bump_version(get_auth_version_name(user_id))
+
+
+class TokenCache:
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    @staticmethod
+    def get_shared_key(key):
+        return 'auth-token:{}'.format(md5(key.encode()).hexdigest())
+
+    def get_local_entry(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        return entry
+
+    def set_local_entry(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def get_shared_entry(self, key):
+        if not settings.TOKEN_CACHE_SHARED:
+            return None
+        entry = cache.get(self.get_shared_key(key))
+        if entry is None:
+            return None
+        entry = (*entry, monotonic() + self.timeout)
+        self.set_local_entry(key, entry)
+        return entry
+
+    def get(self, key):
+        entry = self.get_local_entry(key)
+        if entry is None or entry[-1] < monotonic():
+            entry = self.get_shared_entry(key)
+        if entry is None:
+            self.discard(key)
+            return None
+        user, token, version, _ = entry
+        if version != get_version(get_auth_version_name(user.id)):
+            self.discard(key)
+            return None
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return user, token
+
+    def set(self, key, user, token):
+        entry = (
+            copy.copy(user),
+            copy.copy(token),
+            get_version(get_auth_version_name(user.id)),
+        )
+        self.set_local_entry(key, (*entry, monotonic() + self.timeout))
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(self.get_shared_key(key), entry, self.timeout)
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            if not user.is_active:
+                raise AuthenticationFailed('User inactive or deleted.')
+            return user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
@@ -0,0 +1,89 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from food.constants import REFERENCE_CACHE_TIMEOUT
+
+
+def get_version(name):
+    version_key = f'version:{name}'
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_version(name):
+    cache.set(f'version:{name}', uuid4().hex, None)
+
+
+def make_etag(*parts):
+    return '"{}"'.format(
+        md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    )
+
+
+class ReferenceCache:
+    def __init__(self):
+        self.local_values = {}
+        self.markers = {}
+
+    def register_marker(self, name, get_marker):
+        # Changes that skip signals, such as bulk loads from another
+        # process, are still seen through a marker read from the database.
+        self.markers[name] = get_marker
+
+    def invalidate(self, name):
+        bump_version(name)
+
+    def get_version(self, name):
+        version = get_version(name)
+        if name in self.markers:
+            return f'{version}:{self.markers[name]()}'
+        return version
+
+    def get_local_value(self, name, kind, build, version=None):
+        if version is None:
+            version = self.get_version(name)
+        local_version, value = self.local_values.get(
+            (name, kind), (None, None)
+        )
+        if local_version != version:
+            value = build()
+            self.local_values[(name, kind)] = (version, value)
+        return value
+
+    def get_shared_content(self, name, version, render):
+        content_key = f'reference-content:{name}:{version}'
+        content = cache.get(content_key)
+        if content is None:
+            content = render()
+            cache.set(content_key, content, REFERENCE_CACHE_TIMEOUT)
+        return content
+
+    def get_content(self, name, version, render):
+        return self.get_local_value(
+            name,
+            'content',
+            lambda: self.get_shared_content(name, version, render),
+            version,
+        )
+
+    def get_response(self, request, name, render):
+        version = self.get_version(name)
+        etag = make_etag(name, version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                self.get_content(name, version, render),
+                content_type='application/json',
+            )
+        response['ETag'] = etag
+        return response
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,60 @@
+import csv
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class BaseShoppingCartExporter:
+    content_type = None
+    extension = None
+
+    def get_header(self):
+        return ()
+
+    def render_row(self, cart_data):
+        raise NotImplementedError
+
+    def stream(self, queryset):
+        yield from self.get_header()
+        for cart_data in queryset:
+            yield self.render_row(cart_data)
+
+
+class TextShoppingCartExporter(BaseShoppingCartExporter):
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def render_row(self, cart_data):
+        return (
+            f'• {cart_data["ingredient__name"]}'
+            f'({cart_data["ingredient__measurement_unit"]})'
+            f' - {cart_data["total_amount"]}\n'
+        )
+
+
+class CsvShoppingCartExporter(BaseShoppingCartExporter):
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def get_header(self):
+        return (self.writer.writerow(('name', 'measurement_unit', 'amount')),)
+
+    def render_row(self, cart_data):
+        return self.writer.writerow(
+            (
+                cart_data['ingredient__name'],
+                cart_data['ingredient__measurement_unit'],
+                cart_data['total_amount'],
+            )
+        )
+
+
+SHOPPING_CART_EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TextShoppingCartExporter, CsvShoppingCartExporter)
+}
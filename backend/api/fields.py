@@ -1,15 +1,131 @@
 import base64
+import binascii
+from collections.abc import Mapping
 
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+from api.cache import reference_cache
+from api.images import get_rendition_url
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+    def __del__(self):
+        self.close()
 
 
 class Base64ImageField(serializers.ImageField):
+    decode_chunk_size = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            image_file = DecodedImageFile(
+                'temp.' + ext, format.split(':')[-1], None, None
+            )
+            # Chunks are only decodable on their own when they hold a
+            # multiple of four base64 characters, so line breaks go first.
+            imgstr = ''.join(imgstr.split())
+            try:
+                for start in range(0, len(imgstr), self.decode_chunk_size):
+                    image_file.write(
+                        base64.b64decode(
+                            imgstr[start:start + self.decode_chunk_size]
+                        )
+                    )
+            except binascii.Error:
+                self.fail('invalid')
+            image_file.size = image_file.tell()
+            image_file.seek(0)
+            data = image_file
+
+        return super().to_internal_value(data)
+
+
+class RenditionImageField(serializers.ImageField):
+    def __init__(self, rendition, context_key=None, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.rendition = rendition
+        self.context_key = context_key
+
+    def to_representation(self, value):
+        url = get_rendition_url(
+            value, self.context.get(self.context_key, self.rendition)
+        )
+        request = self.context.get('request')
+        if url is not None and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, cached=False, **kwargs):
+        super().__init__(**kwargs)
+        self.cached = cached
+        self.resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
 
+    @staticmethod
+    def to_pk(value):
+        return int(str(value))
+
+    def get_objects(self, pks):
+        if not self.cached:
+            return self.get_queryset().in_bulk(pks)
+        objects = reference_cache.get_local_value(
+            self.queryset.model._meta.label_lower,
+            'objects-by-pk',
+            lambda: self.get_queryset().in_bulk(),
+        )
+        return {pk: objects[pk] for pk in pks if pk in objects}
+
+    def resolve(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(value))
+            except ValueError:
+                pass
+        self.resolved = self.get_objects(pks)
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except ValueError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.resolve(data)
+        return super().to_internal_value(data)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for field in self.child.fields.values():
+                if isinstance(field, BulkPrimaryKeyRelatedField):
+                    field.resolve(
+                        item.get(field.field_name)
+                        for item in data
+                        if isinstance(item, Mapping)
+                    )
         return super().to_internal_value(data)
@@ -1,13 +1,35 @@
 import django_filters.rest_framework as filters
+from django.db.models import Exists, F, OuterRef
 
+from api.cache import reference_cache
+from api.search import ingredient_autocomplete, recipe_search
+from food.constants import MAX_INGREDIENT_SEARCH_RESULTS
 from food.models import Ingredient, Recipe, Tag
 
 
+def get_tag_ids_by_slug():
+    return reference_cache.get_local_value(
+        Tag._meta.label_lower,
+        'ids-by-slug',
+        lambda: dict(Tag.objects.values_list('slug', 'id')),
+    )
+
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-created_at', '-id'),
+    'trending': (
+        F('rank__trending_score').desc(nulls_last=True),
+        '-favorites_count',
+        '-created_at',
+        '-id',
+    ),
+}
+
+
 class RecipeFilter(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        to_field_name='slug',
-        field_name='tags__slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: ((slug, slug) for slug in get_tag_ids_by_slug()),
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited',
@@ -15,17 +37,41 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=tuple(
+            (ordering, ordering) for ordering in RECIPE_ORDERINGS
+        ),
+        method='filter_ordering',
+    )
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids_by_slug = get_tag_ids_by_slug()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag__in=[tag_ids_by_slug[slug] for slug in value],
+                )
+            )
+        )
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favourites__author=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shoppingcart__author=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        return recipe_search.search(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     class Meta:
         model = Recipe
         fields = (
@@ -33,11 +79,18 @@ class RecipeFilter(filters.FilterSet):
             'tags',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
+            'ordering',
         )
 
 
 class IngredientSearch(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='icontains', field_name='name')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        return ingredient_autocomplete.search(
+            queryset, value, MAX_INGREDIENT_SEARCH_RESULTS
+        )
 
     class Meta:
         model = Ingredient
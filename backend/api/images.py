@@ -0,0 +1,79 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.transaction import on_commit
+from PIL import Image, features
+
+RENDITION_SIZES = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RENDITION_FORMAT, RENDITION_EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+)
+
+logger = logging.getLogger(__name__)
+rendition_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def get_rendition_name(name, rendition):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory,
+        'renditions',
+        f'{stem}_{rendition}.{RENDITION_EXTENSION}',
+    )
+
+
+def create_renditions(name):
+    missing = {
+        rendition: rendition_name
+        for rendition, rendition_name in (
+            (rendition, get_rendition_name(name, rendition))
+            for rendition in RENDITION_SIZES
+        )
+        if not default_storage.exists(rendition_name)
+    }
+    if not missing:
+        return
+    with default_storage.open(name) as original_file:
+        original = Image.open(original_file)
+        original.load()
+    if RENDITION_FORMAT == 'JPEG' or original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGB')
+    for rendition, rendition_name in missing.items():
+        image = original.copy()
+        image.thumbnail(RENDITION_SIZES[rendition])
+        content = BytesIO()
+        image.save(content, RENDITION_FORMAT, quality=85)
+        default_storage.save(rendition_name, ContentFile(content.getvalue()))
+
+
+def create_renditions_logged(name):
+    try:
+        create_renditions(name)
+    except Exception:
+        logger.exception('Could not create renditions of %s', name)
+
+
+def schedule_renditions(image):
+    if image:
+        name = image.name
+        on_commit(
+            lambda: rendition_executor.submit(create_renditions_logged, name)
+        )
+
+
+def get_rendition_url(image, rendition):
+    if not image:
+        return None
+    rendition_name = get_rendition_name(image.name, rendition)
+    if default_storage.exists(rendition_name):
+        return default_storage.url(rendition_name)
+    return image.url
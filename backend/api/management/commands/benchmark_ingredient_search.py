@@ -0,0 +1,59 @@
+import json
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.search import IngredientPrefixIndex
+from food.constants import MAX_INGREDIENT_SEARCH_RESULTS
+
+INGREDIENT_DATA_PATH = settings.BASE_DIR / 'data/ingredients.json'
+
+
+def naive_search(ingredients, query, limit):
+    query = query.casefold()
+    matches = sorted(
+        (not name.casefold().startswith(query), name.casefold(), pk)
+        for pk, name in ingredients
+        if query in name.casefold()
+    )
+    return [pk for _, _, pk in matches[:limit]]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ingredient autocomplete over data/ingredients.json.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with open(INGREDIENT_DATA_PATH, 'r') as file:
+            ingredients = tuple(
+                (pk, item['name']) for pk, item in enumerate(json.load(file))
+            )
+        queries = tuple(
+            name[start:start + length]
+            for _, name in ingredients[::25]
+            for start in (0, 2)
+            for length in (1, 2, 3, 5)
+            if len(name) >= start + length
+        )
+        index = IngredientPrefixIndex(ingredients)
+        for label, search in (
+            ('naive scan', lambda query: naive_search(
+                ingredients, query, MAX_INGREDIENT_SEARCH_RESULTS
+            )),
+            ('prefix index', lambda query: index.search(
+                query, MAX_INGREDIENT_SEARCH_RESULTS
+            )),
+        ):
+            started = perf_counter()
+            for _ in range(options['repeat']):
+                for query in queries:
+                    search(query)
+            elapsed = perf_counter() - started
+            per_query = elapsed / (options['repeat'] * len(queries))
+            self.stdout.write(
+                f'{label}: {len(ingredients)} ingredients, '
+                f'{len(queries)} queries, {per_query * 1e6:.1f} µs/query'
+            )
@@ -0,0 +1,67 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from api.search import RecipeIngredientIndex
+
+
+def naive_search(recipe_ingredients, ingredient_ids):
+    ranked = []
+    for recipe_id, recipe_ingredient_ids in recipe_ingredients.items():
+        matched = len(recipe_ingredient_ids & ingredient_ids)
+        if matched:
+            ranked.append(
+                (matched / len(recipe_ingredient_ids), matched, recipe_id)
+            )
+    ranked.sort(reverse=True)
+    return [(recipe_id, coverage) for coverage, _, recipe_id in ranked]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pantry search over randomly generated recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=50000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--pantry-size', type=int, default=15)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        ingredient_ids = range(1, options['ingredients'] + 1)
+        recipe_ingredients = {
+            recipe_id: set(
+                generator.sample(ingredient_ids, generator.randint(3, 15))
+            )
+            for recipe_id in range(1, options['recipes'] + 1)
+        }
+        pantries = [
+            set(generator.sample(ingredient_ids, options['pantry_size']))
+            for _ in range(options['queries'])
+        ]
+
+        started = perf_counter()
+        index = RecipeIngredientIndex(
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredients in recipe_ingredients.items()
+            for ingredient_id in ingredients
+        )
+        self.stdout.write(
+            f'index build: {(perf_counter() - started) * 1e3:.1f} ms'
+        )
+        for label, search in (
+            ('naive scan', lambda pantry: naive_search(
+                recipe_ingredients, pantry
+            )),
+            ('ingredient index', index.search),
+        ):
+            started = perf_counter()
+            for pantry in pantries:
+                search(pantry)
+            per_query = (perf_counter() - started) / len(pantries)
+            self.stdout.write(
+                f'{label}: {len(recipe_ingredients)} recipes, '
+                f'{len(pantries)} queries, {per_query * 1e3:.2f} ms/query'
+            )
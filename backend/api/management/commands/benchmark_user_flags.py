@@ -0,0 +1,53 @@
+from time import perf_counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db.models import Exists
+
+from food.models import Favourite, Recipe, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the anonymous recipe flag annotations with the former '
+        'Exists(none()) subqueries on the current database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        querysets = (
+            (
+                'Exists(none())',
+                Recipe.objects.annotate(
+                    is_favorited=Exists(Favourite.objects.none()),
+                    is_in_shopping_cart=Exists(ShoppingCart.objects.none()),
+                ),
+            ),
+            (
+                'Value(False)',
+                Recipe.objects.get_is_favorited_is_in_shopping_cart(
+                    AnonymousUser()
+                ),
+            ),
+        )
+        for label, queryset in querysets:
+            queryset = queryset[:options['limit']]
+            sql = str(queryset.query)
+            self.stdout.write(f'{label}: {sql}')
+
+            started = perf_counter()
+            for _ in range(options['repeat']):
+                queryset.all().query.sql_with_params()
+            compile_time = (perf_counter() - started) / options['repeat']
+
+            started = perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset.all())
+            query_time = (perf_counter() - started) / options['repeat']
+            self.stdout.write(
+                f'{label}: compile {compile_time * 1e6:.1f} µs, '
+                f'compile and fetch {query_time * 1e6:.1f} µs'
+            )
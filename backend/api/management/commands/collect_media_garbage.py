@@ -0,0 +1,68 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.images import RENDITION_SIZES, get_rendition_name
+from food.models import Recipe, User
+from food.storage import content_addressed_storage
+
+IMAGES_DIRECTORY = 'api/images'
+
+
+class Command(BaseCommand):
+    help = 'Delete uploaded images and renditions no longer referenced.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24,
+            help='Keep unreferenced files younger than this many hours.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def get_stored_names(self, directory):
+        directories, files = content_addressed_storage.listdir(directory)
+        for file in files:
+            yield posixpath.join(directory, file)
+        for subdirectory in directories:
+            yield from self.get_stored_names(
+                posixpath.join(directory, subdirectory)
+            )
+
+    def get_referenced_names(self):
+        referenced_names = set()
+        for queryset in (
+            Recipe.objects.values_list('image', flat=True),
+            User.objects.values_list('avatar', flat=True),
+        ):
+            referenced_names.update(name for name in queryset if name)
+        for name in tuple(referenced_names):
+            referenced_names.update(
+                get_rendition_name(name, rendition)
+                for rendition in RENDITION_SIZES
+            )
+        return referenced_names
+
+    def handle(self, *args, **options):
+        if not content_addressed_storage.exists(IMAGES_DIRECTORY):
+            return
+        referenced_names = self.get_referenced_names()
+        created_before = timezone.now() - timedelta(hours=options['min_age'])
+        deleted = 0
+        for name in self.get_stored_names(IMAGES_DIRECTORY):
+            if (
+                name in referenced_names
+                or content_addressed_storage.get_modified_time(name)
+                > created_before
+            ):
+                continue
+            self.stdout.write(f'Deleting {name}')
+            if not options['dry_run']:
+                content_addressed_storage.purge(name)
+            deleted += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'{deleted} unreferenced files deleted')
+        )
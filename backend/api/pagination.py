@@ -1,6 +1,169 @@
-from rest_framework.pagination import PageNumberPagination
+from functools import partial
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       LimitOffsetPagination,
+                                       PageNumberPagination)
+
+from api.cache import get_version
 
 
 class PageNumberWithLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
+
+
+class CachedCountPaginator(DjangoPaginator):
+    def __init__(self, *args, get_count, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.get_count = get_count
+
+    @cached_property
+    def count(self):
+        return self.get_count(self.object_list)
+
+
+class CachedCountMixin:
+    count_cache_timeout = 30
+    count_estimate_threshold = None
+    view = None
+
+    def configure_count(self, view):
+        for attr in ('count_cache_timeout', 'count_estimate_threshold'):
+            setattr(self, attr, getattr(view, attr, getattr(self, attr)))
+        self.view = view
+
+    def get_count_versions(self, queryset):
+        get_names = getattr(self.view, 'get_count_version_names', None)
+        names = (
+            get_names() if get_names else (queryset.model._meta.label_lower,)
+        )
+        return [get_version(name) for name in names]
+
+    def estimate_count(self, queryset, sql, params):
+        connection = connections[queryset.db]
+        if (
+            self.count_estimate_threshold is None
+            or connection.vendor != 'postgresql'
+        ):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            estimate = cursor.fetchone()[0][0]['Plan']['Plan Rows']
+        if estimate < self.count_estimate_threshold:
+            return None
+        return estimate
+
+    def get_count(self, queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        versions = ':'.join(self.get_count_versions(queryset))
+        signature = f'{queryset.db}:{sql}:{params}:{versions}'
+        cache_key = 'count:{}'.format(md5(signature.encode()).hexdigest())
+        count = cache.get(cache_key)
+        if count is None:
+            count = self.estimate_count(queryset, sql, params)
+            if count is None:
+                count = queryset.count()
+            cache.set(cache_key, count, self.count_cache_timeout)
+        return count
+
+
+class CachedCountPageNumberPagination(
+    CachedCountMixin, PageNumberWithLimitPagination
+):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.configure_count(view)
+        self.django_paginator_class = partial(
+            CachedCountPaginator, get_count=self.get_count
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CachedCountLimitOffsetPagination(
+    CachedCountMixin, LimitOffsetPagination
+):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.configure_count(view)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    ordering = ('created_at', 'pk')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    @staticmethod
+    def get_position(recipe):
+        return f'{recipe.created_at.isoformat()} {recipe.pk}'
+
+    def parse_position(self, position):
+        try:
+            created_at, pk = position.split(' ')
+            created_at, pk = parse_datetime(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        has_position = self.cursor is not None and bool(self.cursor.position)
+
+        if has_position:
+            created_at, pk = self.parse_position(self.cursor.position)
+            lookup = 'lt' if reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'created_at__{lookup}': created_at})
+                | Q(created_at=created_at, **{f'pk__{lookup}': pk})
+            )
+        if reverse:
+            queryset = queryset.order_by('-created_at', '-pk')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, has_position
+        return self.page
+
+    def get_next_link(self):
+        if not (self.page and self.has_next):
+            return None
+        return self.encode_cursor(
+            Cursor(
+                offset=0,
+                reverse=False,
+                position=self.get_position(self.page[-1]),
+            )
+        )
+
+    def get_previous_link(self):
+        if not (self.page and self.has_previous):
+            return None
+        return self.encode_cursor(
+            Cursor(
+                offset=0,
+                reverse=True,
+                position=self.get_position(self.page[0]),
+            )
+        )
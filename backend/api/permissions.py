@@ -6,5 +6,5 @@ class IsAuthorOrReadOnly(permissions.IsAuthenticatedOrReadOnly):
         return (
             request.method in permissions.SAFE_METHODS
             or request.user.is_authenticated
-            and (request.user.is_superuser or request.user == obj.author)
+            and (request.user.is_superuser or request.user.id == obj.author_id)
         )
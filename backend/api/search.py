@@ -0,0 +1,226 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Q, When
+
+from api.cache import get_version, reference_cache
+from food.constants import SEARCH_CONFIG
+from food.models import Ingredient, Recipe, RecipeIngredient
+
+SEARCH_WEIGHTS = {
+    'name': 1.0,
+    'ingredients': 0.4,
+    'text': 0.2,
+}
+
+
+class IngredientPrefixIndex:
+    def __init__(self, ingredients):
+        self.entries = sorted(
+            (name.casefold(), pk) for pk, name in ingredients
+        )
+
+    def search(self, query, limit):
+        query = query.casefold()
+        found_ids = []
+        start = bisect_left(self.entries, (query,))
+        for name, pk in self.entries[start:]:
+            if len(found_ids) == limit or not name.startswith(query):
+                break
+            found_ids.append(pk)
+        for name, pk in self.entries:
+            if len(found_ids) == limit:
+                break
+            if query in name and not name.startswith(query):
+                found_ids.append(pk)
+        return found_ids
+
+
+class IngredientAutocomplete:
+    @staticmethod
+    def get_index():
+        return reference_cache.get_local_value(
+            Ingredient._meta.label_lower,
+            'prefix-index',
+            lambda: IngredientPrefixIndex(
+                Ingredient.objects.values_list('id', 'name')
+            ),
+        )
+
+    def search(self, queryset, query, limit):
+        if connection.vendor == 'postgresql':
+            return queryset.filter(name__icontains=query).annotate(
+                name_starts_with=ExpressionWrapper(
+                    Q(name__istartswith=query), output_field=BooleanField()
+                )
+            ).order_by('-name_starts_with', *Ingredient._meta.ordering)[
+                :limit
+            ]
+        found_ids = self.get_index().search(query, limit)
+        if not found_ids:
+            return queryset.none()
+        return queryset.filter(id__in=found_ids).order_by(
+            Case(
+                *(
+                    When(id=ingredient_id, then=position)
+                    for position, ingredient_id in enumerate(found_ids)
+                )
+            )
+        )
+
+
+class RecipeInvertedIndex:
+    def __init__(self, recipes):
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, fields in recipes.items():
+            for field, value in fields.items():
+                for token in self.tokenize(value):
+                    postings[token][pk] += SEARCH_WEIGHTS[field]
+        self.tokens = sorted(postings)
+        self.postings = postings
+
+    @staticmethod
+    def tokenize(value):
+        return re.findall(r'\w+', value.casefold())
+
+    def get_token_scores(self, query_token):
+        scores = defaultdict(float)
+        start = bisect_left(self.tokens, query_token)
+        for token in self.tokens[start:]:
+            if not token.startswith(query_token):
+                break
+            for pk, score in self.postings[token].items():
+                scores[pk] += score
+        return scores
+
+    def search(self, query):
+        scores = None
+        for query_token in self.tokenize(query):
+            token_scores = self.get_token_scores(query_token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    pk: score + token_scores[pk]
+                    for pk, score in scores.items()
+                    if pk in token_scores
+                }
+        return sorted(scores or (), key=lambda pk: (-scores[pk], -pk))
+
+
+class RecipeSearch:
+    def __init__(self):
+        self.index = None
+        self.version = None
+
+    def get_index(self):
+        version = (
+            get_version(Recipe._meta.label_lower),
+            get_version(Ingredient._meta.label_lower),
+        )
+        if self.index is None or version != self.version:
+            recipes = {
+                pk: {'name': name, 'text': text, 'ingredients': ''}
+                for pk, name, text in Recipe.objects.values_list(
+                    'id', 'name', 'text'
+                )
+            }
+            for pk, name in RecipeIngredient.objects.values_list(
+                'recipe', 'ingredient__name'
+            ):
+                recipes[pk]['ingredients'] += f' {name}'
+            self.index = RecipeInvertedIndex(recipes)
+            self.version = version
+        return self.index
+
+    def search(self, queryset, query):
+        if connection.vendor == 'postgresql':
+            search_query = SearchQuery(
+                query, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return (
+                queryset.filter(search_vector=search_query)
+                .annotate(
+                    search_rank=SearchRank(F('search_vector'), search_query)
+                )
+                .order_by('-search_rank', '-created_at', '-id')
+            )
+        found_ids = self.get_index().search(query)
+        if not found_ids:
+            return queryset.none()
+        return queryset.filter(id__in=found_ids).order_by(
+            Case(
+                *(
+                    When(id=recipe_id, then=position)
+                    for position, recipe_id in enumerate(found_ids)
+                )
+            )
+        )
+
+
+class RecipeIngredientIndex:
+    def __init__(self, recipe_ingredients):
+        self.sizes = Counter()
+        self.recipes_by_ingredient = defaultdict(list)
+        for recipe_id, ingredient_id in recipe_ingredients:
+            self.sizes[recipe_id] += 1
+            self.recipes_by_ingredient[ingredient_id].append(recipe_id)
+
+    def search(self, ingredient_ids):
+        matches = Counter()
+        for ingredient_id in ingredient_ids:
+            matches.update(self.recipes_by_ingredient.get(ingredient_id, ()))
+        ranked = sorted(
+            (
+                (matched / self.sizes[recipe_id], matched, recipe_id)
+                for recipe_id, matched in matches.items()
+            ),
+            reverse=True,
+        )
+        return [(recipe_id, coverage) for coverage, _, recipe_id in ranked]
+
+
+class PantrySearch:
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def build_index(self, version):
+        self.index = RecipeIngredientIndex(
+            RecipeIngredient.objects.values_list('recipe', 'ingredient')
+        )
+        self.version = version
+
+    def rebuild_index(self, version):
+        try:
+            self.build_index(version)
+        finally:
+            connection.close()
+            self.lock.release()
+
+    def get_index(self):
+        version = get_version(Recipe._meta.label_lower)
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.build_index(version)
+        elif version != self.version and self.lock.acquire(blocking=False):
+            # Outdated indexes keep serving requests while a fresh one is
+            # built in the background.
+            self.executor.submit(self.rebuild_index, version)
+        return self.index
+
+    def search(self, ingredient_ids):
+        return self.get_index().search(ingredient_ids)
+
+
+ingredient_autocomplete = IngredientAutocomplete()
+recipe_search = RecipeSearch()
+pantry_search = PantrySearch()
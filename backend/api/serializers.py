@@ -1,10 +1,14 @@
+from django.db import IntegrityError
 from django.db.transaction import atomic
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
+from rest_framework.settings import api_settings
 
-from api.fields import Base64ImageField
+from api.fields import (Base64ImageField, BulkPrimaryKeyRelatedField,
+                        BulkRelatedListSerializer, RenditionImageField)
+from api.images import schedule_renditions
+from food.constants import MAX_BULK_ITEMS
 from food.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
-                         ShoppingCart, Tag, User)
+                         ShoppingCart, ShoppingCartIngredient, Tag, User)
 from foodgram_user.models import Subscribe
 
 
@@ -15,9 +19,17 @@ class UserAvatarSeriazlier(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        previous_avatar = instance.avatar.name
+        instance = super().update(instance, validated_data)
+        if instance.avatar.name != previous_avatar:
+            schedule_renditions(instance.avatar)
+        return instance
+
 
 class UserReadSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar = RenditionImageField('thumbnail')
 
     class Meta:
         model = User
@@ -32,6 +44,8 @@ class UserReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'subscribed'):
+            return obj.subscribed
         request = self.context.get('request')
         return (
             request is not None
@@ -43,6 +57,8 @@ class UserReadSerializer(serializers.ModelSerializer):
 
 
 class ShoppingCartFavouriteSerializerResponse(serializers.ModelSerializer):
+    image = RenditionImageField('thumbnail')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -67,26 +83,51 @@ class SubscriptionReadSerializer(UserReadSerializer):
         )
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj)
-        if recipes_limit:
-            recipes = recipes[: int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes_limit = self.context.get('recipes_limit')
+            recipes = Recipe.objects.filter(author=obj)
+            if recipes_limit:
+                recipes = recipes[: int(recipes_limit)]
         return ShoppingCartFavouriteSerializerResponse(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class CreateOnceMixin:
+    already_done_message = 'The operation is already done'
+    owner_field = 'author'
+
+    def create(self, validated_data):
+        try:
+            with atomic():
+                User.objects.filter(
+                    pk=validated_data[self.owner_field].pk
+                ).lock()
+                return super().create(validated_data)
+        except IntegrityError:
+            if not self.Meta.model.objects.filter(**validated_data).exists():
+                raise
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        self.already_done_message
+                    ]
+                }
+            )
+
+
+class SubscriptionSerializer(CreateOnceMixin, serializers.ModelSerializer):
+    already_done_message = 'You are already subscribed to this user'
+    owner_field = 'user'
+
     class Meta:
         model = Subscribe
         fields = ('user', 'subscription')
-        validators = (
-            UniqueTogetherValidator(
-                queryset=Subscribe.objects.all(),
-                fields=('user', 'subscription'),
-            ),
-        )
 
     def to_representation(self, instance):
         return SubscriptionReadSerializer(
@@ -101,19 +142,20 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return super().validate(data)
 
 
-class BaseFavoriteShoppingCartSeralizer(serializers.ModelSerializer):
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_ITEMS,
+    )
+
+
+class BaseFavoriteShoppingCartSeralizer(
+    CreateOnceMixin, serializers.ModelSerializer
+):
     class Meta:
         fields = ('recipe', 'author')
 
-    def validate(self, attrs):
-        recipe = attrs.get('recipe')
-        author = attrs.get('author')
-        if self.Meta.model.objects.filter(
-            recipe=recipe, author=author
-        ).exists():
-            raise serializers.ValidationError('The operation is already done')
-        return attrs
-
     def to_representation(self, instance):
         return ShoppingCartFavouriteSerializerResponse(instance.recipe).data
 
@@ -141,11 +183,14 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(
+        queryset=Ingredient.objects.all(), cached=True
+    )
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = BulkRelatedListSerializer
 
 
 class RecipeIngredientReadSerializer(serializers.ModelSerializer):
@@ -170,7 +215,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.BooleanField(
         read_only=True, default=False
     )
-    image = Base64ImageField()
+    image = RenditionImageField(
+        'card', context_key='recipe_image_rendition'
+    )
 
     class Meta:
         model = Recipe
@@ -188,14 +235,22 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
 
+class PantryRecipeSerializer(RecipeReadSerializer):
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('coverage',)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         source='recipe_ingredients', many=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    tags = BulkPrimaryKeyRelatedField(
+        queryset=Tag.objects.all(), many=True, cached=True
     )
     image = Base64ImageField()
+    written_relations = None
 
     class Meta:
         model = Recipe
@@ -235,16 +290,85 @@ class RecipeSerializer(serializers.ModelSerializer):
         return attrs
 
     @staticmethod
-    def create_recipe_ingredient_data(recipe, ingredients_data):
-        recipe_ingredient_data = (
+    def sync_recipe_ingredients(recipe, ingredients_data, created=False):
+        existing = {} if created else {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.select_related(
+                'ingredient'
+            ).order_by('id')
+        }
+        new_amounts = {
+            ingredient_data['id'].id: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+        removed = [
+            recipe_ingredient
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id not in new_amounts
+        ]
+        changed = [
+            recipe_ingredient
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id in new_amounts
+            and recipe_ingredient.amount != new_amounts[ingredient_id]
+        ]
+        added = [
             RecipeIngredient(
                 recipe=recipe,
                 ingredient=ingredient_data['id'],
-                amount=ingredient_data.get('amount'),
+                amount=ingredient_data['amount'],
             )
             for ingredient_data in ingredients_data
+            if ingredient_data['id'].id not in existing
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(
+                pk__in=[recipe_ingredient.pk for recipe_ingredient in removed]
+            ).delete()
+        for recipe_ingredient in changed:
+            recipe_ingredient.amount = new_amounts[
+                recipe_ingredient.ingredient_id
+            ]
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(added)
+        recipe_ingredients = [
+            recipe_ingredient
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id in new_amounts
+        ] + added
+        changed_ingredients = {
+            recipe_ingredient.ingredient_id
+            for recipe_ingredient in removed + changed + added
+        }
+        return recipe_ingredients, changed_ingredients
+
+    @staticmethod
+    def sync_tags(recipe, tags, created=False):
+        tag_ids = {tag.id for tag in tags}
+        existing_ids = (
+            set()
+            if created
+            else set(recipe.tags.values_list('id', flat=True))
+        )
+        if existing_ids - tag_ids:
+            Recipe.tags.through.objects.filter(
+                recipe=recipe, tag__in=existing_ids - tag_ids
+            ).delete()
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for tag_id in tag_ids - existing_ids
         )
-        RecipeIngredient.objects.bulk_create(recipe_ingredient_data)
+
+    def cache_written_relations(self, recipe, tags, recipe_ingredients):
+        request_user = self.context['request'].user
+        if recipe.author_id == request_user.id:
+            recipe.author = request_user
+            request_user.subscribed = False
+        self.written_relations = {
+            'tags': sorted(tags, key=lambda tag: tag.name),
+            'recipe_ingredients': recipe_ingredients,
+        }
 
     @atomic
     def create(self, validated_data):
@@ -254,25 +378,51 @@ class RecipeSerializer(serializers.ModelSerializer):
         validated_data['author'] = request.user
         recipe = Recipe.objects.create(**validated_data)
 
-        self.create_recipe_ingredient_data(recipe, ingredients_data)
-
-        recipe.tags.set(tags_data)
+        recipe_ingredients, _ = self.sync_recipe_ingredients(
+            recipe, ingredients_data, created=True
+        )
+        self.sync_tags(recipe, tags_data, created=True)
+        schedule_renditions(recipe.image)
 
+        self.cache_written_relations(recipe, tags_data, recipe_ingredients)
         return recipe
 
+    @atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients', None)
         tags_data = validated_data.pop('tags', None)
         if tags_data is not None:
-            instance.tags.set(tags_data)
+            self.sync_tags(instance, tags_data)
 
+        recipe_ingredients = None
         if ingredients_data is not None:
-            instance.ingredients.clear()
-            self.create_recipe_ingredient_data(instance, ingredients_data)
+            recipe_ingredients, changed_ingredients = (
+                self.sync_recipe_ingredients(instance, ingredients_data)
+            )
+            # bulk_create and bulk_update do not send the signals that
+            # keep the cart totals in sync.
+            if changed_ingredients:
+                ShoppingCartIngredient.objects.refresh_totals(
+                    ShoppingCart.objects.filter(recipe=instance).values(
+                        'author'
+                    ),
+                    changed_ingredients,
+                )
 
-        return super().update(instance, validated_data)
+        previous_image = instance.image.name
+        instance = super().update(instance, validated_data)
+        if instance.image.name != previous_image:
+            schedule_renditions(instance.image)
+
+        if tags_data is not None and recipe_ingredients is not None:
+            self.cache_written_relations(
+                instance, tags_data, recipe_ingredients
+            )
+        return instance
 
     def to_representation(self, instance):
+        if self.written_relations is not None:
+            instance._prefetched_objects_cache = dict(self.written_relations)
         return RecipeReadSerializer(
             instance, context={'request': self.context.get('request')}
         ).data
@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_user_tokens
+from api.cache import bump_version, reference_cache
+from food.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                         ShoppingCart, ShortLink, Tag, User)
+from foodgram_user.models import Subscribe
+
+# The user fields shown inside recipe and subscription payloads.
+USER_PAYLOAD_FIELDS = (
+    'email',
+    'username',
+    'first_name',
+    'last_name',
+    'avatar',
+)
+
+
+reference_cache.register_marker(
+    Ingredient._meta.label_lower,
+    lambda: Ingredient.objects.aggregate(last_id=Max('id'))['last_id'],
+)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_reference_cache(sender, **kwargs):
+    reference_cache.invalidate(sender._meta.label_lower)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipes(sender, **kwargs):
+    bump_version(Recipe._meta.label_lower)
+
+
+@receiver(post_delete, sender=ShortLink)
+def invalidate_short_link(sender, instance, **kwargs):
+    cache.delete_many(
+        (
+            f'short-link-code:{instance.recipe_id}',
+            f'short-link-recipe:{instance.code}',
+        )
+    )
+
+
+@receiver((post_save, post_delete), sender=Favourite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_recipe_flags(sender, instance, **kwargs):
+    bump_version(f'user-flags:{instance.author_id}')
+
+
+@receiver((post_save, post_delete), sender=Favourite)
+def invalidate_popular_ordering(sender, **kwargs):
+    bump_version('recipe-ordering:popular')
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_subscription_flags(sender, instance, **kwargs):
+    bump_version(f'user-flags:{instance.user_id}')
+
+
+@receiver(pre_save, sender=User)
+def check_user_payload_changes(
+    sender, instance, update_fields=None, **kwargs
+):
+    fields = [
+        field
+        for field in USER_PAYLOAD_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    instance.payload_changed = False
+    if instance._state.adding or not fields:
+        return
+    stored = User.objects.filter(pk=instance.pk).values(*fields).first()
+    # An empty avatar is stored as '' but read back as a file named None.
+    instance.payload_changed = stored is None or any(
+        (getattr(instance, field) or None) != (stored[field] or None)
+        for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_users(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if instance.payload_changed:
+        bump_version(User._meta.label_lower)
+    if update_fields != frozenset(('last_login',)):
+        invalidate_user_tokens(instance.id)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    bump_version(User._meta.label_lower)
+    invalidate_user_tokens(instance.id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
@@ -0,0 +1,400 @@
+import base64
+import os
+import tempfile
+from io import BytesIO
+from threading import Barrier, Thread
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.transaction import atomic
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.cache import get_version
+from api.fields import Base64ImageField
+from api.images import create_renditions_logged
+from api.search import pantry_search, recipe_search
+from food.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                         RecipeRank, ShoppingCart, ShoppingCartIngredient, Tag,
+                         User)
+from food.storage import ContentAddressedStorage
+from foodgram_user.models import Subscribe
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        password='password',
+        first_name='Имя',
+        last_name='Фамилия',
+    )
+
+
+class BaseAPITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.authors = [create_user(number) for number in range(1, 4)]
+        cls.tags = [
+            Tag.objects.create(name=f'Тэг {number}', slug=f'tag-{number}')
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                author=self.authors[number % len(self.authors)],
+            )
+            recipe.tags.set(self.tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in self.ingredients
+            )
+            recipes.append(recipe)
+        return recipes
+
+
+class RecipeListQueriesTest(BaseAPITestCase):
+    def test_recipe_list_queries_do_not_grow_with_page_size(self):
+        Favourite.objects.create(
+            author=self.user, recipe=self.create_recipes(5)[0]
+        )
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/?limit=100')
+        self.assertEqual(len(response.data['results']), 5)
+
+        self.create_recipes(20)
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/?limit=100')
+        self.assertEqual(len(response.data['results']), 25)
+
+    def test_subscriptions_queries_do_not_grow_with_page_size(self):
+        self.create_recipes(9)
+        Subscribe.objects.create(user=self.user, subscription=self.authors[0])
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                '/api/users/subscriptions/?recipes_limit=2'
+            )
+        self.assertEqual(len(response.data['results']), 1)
+
+        for author in self.authors[1:]:
+            Subscribe.objects.create(user=self.user, subscription=author)
+        cache.clear()
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                '/api/users/subscriptions/?recipes_limit=2'
+            )
+        self.assertEqual(len(response.data['results']), 3)
+        for subscription in response.data['results']:
+            self.assertEqual(len(subscription['recipes']), 2)
+            self.assertEqual(subscription['recipes_count'], 3)
+
+
+class RecipeFlagFilterPlanTest(BaseAPITestCase):
+    @staticmethod
+    def get_unique_index_name(model):
+        if connection.vendor == 'sqlite':
+            return f'sqlite_autoindex_{model._meta.db_table}_1'
+        return model._meta.constraints[0].name
+
+    @staticmethod
+    def get_plan(queryset):
+        with atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def test_flag_filters_probe_the_unique_index(self):
+        self.create_recipes(5)
+        for flag, model in (
+            ('is_favorited', Favourite),
+            ('is_in_shopping_cart', ShoppingCart),
+        ):
+            with self.subTest(flag=flag):
+                plan = self.get_plan(
+                    Recipe.objects.get_is_favorited_is_in_shopping_cart(
+                        self.user
+                    ).filter(**{flag: True})
+                )
+                # The (recipe, author) unique index answers each EXISTS
+                # probe; the recipes are read in the order of the feed.
+                self.assertIn(self.get_unique_index_name(model), plan)
+                self.assertNotIn('Seq Scan', plan)
+                if connection.vendor == 'sqlite':
+                    self.assertNotRegex(plan, r'SCAN U\d')
+                    self.assertIn(
+                        'SCAN food_recipe USING INDEX '
+                        'recipe-created-at-id-idx',
+                        plan,
+                    )
+
+
+class CachedCountTest(BaseAPITestCase):
+    def test_recipe_count_follows_new_recipes(self):
+        self.create_recipes(2)
+        self.assertEqual(self.client.get('/api/recipes/').data['count'], 2)
+        self.create_recipes(1)
+        self.assertEqual(self.client.get('/api/recipes/').data['count'], 3)
+
+    def test_subscription_count_follows_new_subscriptions(self):
+        Subscribe.objects.create(user=self.user, subscription=self.authors[0])
+        url = '/api/users/subscriptions/'
+        self.assertEqual(self.client.get(url).data['count'], 1)
+        Subscribe.objects.create(user=self.user, subscription=self.authors[1])
+        self.assertEqual(self.client.get(url).data['count'], 2)
+
+
+class ReferenceCacheTest(BaseAPITestCase):
+    def test_bulk_loaded_ingredients_change_the_etag(self):
+        etag = self.client.get('/api/ingredients/')['ETag']
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Новый ингредиент', measurement_unit='г')]
+        )
+        response = self.client.get(
+            '/api/ingredients/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 4)
+
+
+class TrendingOrderingTest(BaseAPITestCase):
+    def test_new_ranking_changes_the_etag(self):
+        recipes = self.create_recipes(2)
+        RecipeRank.objects.refresh_scores(period_days=7, half_life_days=1)
+        url = '/api/recipes/?ordering=trending'
+        etag = self.client.get(url)['ETag']
+        Favourite.objects.create(author=self.authors[0], recipe=recipes[0])
+        RecipeRank.objects.refresh_scores(period_days=7, half_life_days=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['id'], recipes[0].id)
+
+
+class PantrySearchTest(BaseAPITestCase):
+    def test_outdated_index_skips_deleted_recipes(self):
+        self.addCleanup(setattr, pantry_search, 'index', None)
+        recipes = self.create_recipes(3)
+        pantry_search.build_index(get_version(Recipe._meta.label_lower))
+        recipes[0].delete()
+        pantry_search.version = get_version(Recipe._meta.label_lower)
+        ingredient_ids = [ingredient.id for ingredient in self.ingredients]
+        response = self.client.get(
+            '/api/recipes/pantry/', {'ingredients': ingredient_ids}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {recipe['id'] for recipe in response.data['results']},
+            {recipe.id for recipe in recipes[1:]},
+        )
+
+
+class RecipeSearchVectorTest(BaseAPITestCase):
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Search vectors are only stored on PostgreSQL')
+        super().setUp()
+
+    def test_created_recipe_is_found_by_ingredient(self):
+        content = BytesIO()
+        Image.new('RGB', (1, 1)).save(content, 'PNG')
+        image = base64.b64encode(content.getvalue()).decode()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/',
+                {
+                    'name': 'Рецепт',
+                    'text': 'Описание',
+                    'cooking_time': 10,
+                    'image': f'data:image/png;base64,{image}',
+                    'tags': [self.tags[0].id],
+                    'ingredients': [
+                        {'id': self.ingredients[0].id, 'amount': 1}
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(
+            response.data['id'],
+            recipe_search.search(
+                Recipe.objects.all(), self.ingredients[0].name
+            ).values_list('id', flat=True),
+        )
+
+
+class ShoppingCartTotalsTest(BaseAPITestCase):
+    def assert_totals_up_to_date(self):
+        self.assertEqual(
+            {
+                (total.author_id, total.ingredient_id): total.total_amount
+                for total in ShoppingCartIngredient.objects.all()
+            },
+            {
+                (
+                    total['recipe__shoppingcart__author'],
+                    total['ingredient'],
+                ): total['total_amount']
+                for total in ShoppingCartIngredient.objects.get_live_totals()
+            },
+        )
+
+    def test_totals_follow_cart_and_recipe_changes(self):
+        recipes = self.create_recipes(3)
+        for recipe in recipes:
+            ShoppingCart.objects.create(author=self.user, recipe=recipe)
+        self.assertEqual(ShoppingCartIngredient.objects.count(), 3)
+        self.assert_totals_up_to_date()
+        ShoppingCart.objects.filter(recipe=recipes[0]).delete()
+        self.assert_totals_up_to_date()
+        recipe_ingredient = recipes[1].recipe_ingredients.first()
+        recipe_ingredient.amount = 100
+        recipe_ingredient.save()
+        self.assert_totals_up_to_date()
+        recipes[2].delete()
+        self.assert_totals_up_to_date()
+
+
+class BulkAddTest(BaseAPITestCase):
+    def test_bulk_favorite_reports_results_and_recounts(self):
+        recipes = self.create_recipes(3)
+        Favourite.objects.create(author=self.user, recipe=recipes[0])
+        Recipe.objects.filter(pk=recipes[1].pk).update(favorites_count=5)
+        response = self.client.post(
+            '/api/recipes/favorite/bulk/',
+            {'ids': [recipes[0].id, recipes[1].id, 999]},
+            format='json',
+        )
+        self.assertEqual(
+            response.data['results'],
+            [
+                {'id': recipes[0].id, 'result': 'exists'},
+                {'id': recipes[1].id, 'result': 'added'},
+                {'id': 999, 'result': 'not_found'},
+            ],
+        )
+        self.assertFalse(Recipe.objects.get_counter_mismatches().exists())
+
+
+class UserVersionTest(BaseAPITestCase):
+    def test_only_shown_user_fields_bump_the_version(self):
+        version = get_version(User._meta.label_lower)
+        create_user(10)
+        self.user.set_password('new password')
+        self.user.save()
+        self.assertEqual(get_version(User._meta.label_lower), version)
+        self.user.first_name = 'Другое имя'
+        self.user.save()
+        self.assertNotEqual(get_version(User._meta.label_lower), version)
+
+
+class ConcurrentCreateTest(TransactionTestCase):
+    concurrency = 6
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Concurrent writes need a database file or server')
+        cache.clear()
+        self.user = create_user(0)
+        self.author = create_user(1)
+        self.recipe = Recipe.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10, author=self.author
+        )
+
+    def post_concurrently(self, url):
+        barrier = Barrier(self.concurrency)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                statuses.append(client.post(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=post) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def test_concurrent_adds_create_once(self):
+        for url in (
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            f'/api/users/{self.author.id}/subscribe/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.post_concurrently(url),
+                    [201] + [400] * (self.concurrency - 1),
+                )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.recipe.in_carts_count, 1)
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+    def setUp(self):
+        content = BytesIO()
+        Image.new('RGB', (400, 400), 'red').save(content, 'BMP')
+        self.image = content.getvalue()
+
+    def test_line_wrapped_base64_is_decoded(self):
+        field = Base64ImageField()
+        field.decode_chunk_size = 64
+        image_file = field.to_internal_value(
+            'data:image/bmp;base64,'
+            + base64.encodebytes(self.image).decode()
+        )
+        self.assertEqual(image_file.read(), self.image)
+
+    def test_broken_base64_is_invalid(self):
+        with self.assertRaises(ValidationError):
+            Base64ImageField().to_internal_value('data:image/png;base64,abc')
+
+
+class RenditionsTest(SimpleTestCase):
+    def test_rendition_errors_are_logged(self):
+        with self.assertLogs('api.images', 'ERROR'):
+            create_renditions_logged('api/images/missing.png')
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def test_reused_file_is_touched(self):
+        name = self.storage.save('images/a.png', ContentFile(b'image'))
+        os.utime(self.storage.path(name), (0, 0))
+        self.assertEqual(
+            self.storage.save('images/b.png', ContentFile(b'image')), name
+        )
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), 0)
@@ -1,26 +1,40 @@
-import pyshorteners
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.transaction import atomic
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from api.cache import bump_version, get_version, make_etag, reference_cache
+from api.exporters import SHOPPING_CART_EXPORTERS
 from api.filters import IngredientSearch, RecipeFilter
-from api.pagination import PageNumberWithLimitPagination
+from api.pagination import (CachedCountLimitOffsetPagination,
+                            CachedCountPageNumberPagination,
+                            CreatedAtCursorPagination,
+                            PageNumberWithLimitPagination)
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (FavouriteSeriazlier, IngredientSerializer,
+from api.search import pantry_search
+from api.serializers import (BulkIdsSerializer, FavouriteSeriazlier,
+                             IngredientSerializer, PantryRecipeSerializer,
                              RecipeReadSerializer, RecipeSerializer,
                              ShoppingCartSerializer,
                              SubscriptionReadSerializer,
                              SubscriptionSerializer, TagSerializer,
                              UserAvatarSeriazlier)
+from food.constants import SHORT_LINK_CACHE_TIMEOUT
 from food.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
-                         ShoppingCart, Tag, User)
+                         RecipeRank, ShoppingCart, ShoppingCartIngredient,
+                         ShortLink, Tag, User)
 from foodgram_user.models import Subscribe
 
 
@@ -31,16 +45,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
     http_method_names = ('get', 'post', 'patch', 'delete')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = PageNumberWithLimitPagination
+    pagination_class = CachedCountPageNumberPagination
+    count_estimate_threshold = 10000
+    list_cache_timeout = 60 * 5
+    user_list_cache_timeout = 10
+    lookup_value_regex = r'\d+'
 
     def get_queryset(self):
-        return Recipe.objects.get_is_favorited_is_in_shopping_cart(
+        queryset = Recipe.objects.get_is_favorited_is_in_shopping_cart(
             self.request.user
         )
+        if self.action in ('retrieve', 'list', 'get_pantry_recipes'):
+            queryset = queryset.get_read_related(self.request.user)
+        return queryset
+
+    def get_count_version_names(self):
+        user = self.request.user
+        names = [
+            Recipe._meta.label_lower,
+            Tag._meta.label_lower,
+            Ingredient._meta.label_lower,
+        ]
+        if user.is_authenticated:
+            names.append(f'user-flags:{user.id}')
+        return names
+
+    @property
+    def paginator(self):
+        if (
+            CreatedAtCursorPagination.cursor_query_param
+            in self.request.query_params
+        ):
+            self.pagination_class = CreatedAtCursorPagination
+        return super().paginator
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
+        if self.action == 'retrieve':
+            context['recipe_image_rendition'] = 'full'
         return context
 
     def get_serializer_class(self):
@@ -48,6 +91,88 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeSerializer
 
+    @staticmethod
+    def get_ordering_version(ordering):
+        if not ordering:
+            return None
+        version = get_version(f'recipe-ordering:{ordering}')
+        if ordering == 'trending':
+            # rank_recipes runs in its own process, and its version bump
+            # does not reach a process-local cache.
+            return version, RecipeRank.objects.get_ranked_at()
+        return version
+
+    def get_etag(self):
+        user = self.request.user
+        ordering = self.request.query_params.get('ordering')
+        return make_etag(
+            self.request.get_full_path(),
+            user.id,
+            user.is_authenticated and get_version(f'user-flags:{user.id}'),
+            get_version(Recipe._meta.label_lower),
+            get_version(User._meta.label_lower),
+            get_version(Tag._meta.label_lower),
+            get_version(Ingredient._meta.label_lower),
+            self.get_ordering_version(ordering),
+        )
+
+    def get_conditional_response(self, get_response, **kwargs):
+        etag = self.get_etag()
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = get_response(self.request, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        return response
+
+    def get_list_cache_key(self):
+        user = self.request.user
+        ordering = self.request.query_params.get('ordering')
+        params = sorted(
+            (key, sorted(self.request.query_params.getlist(key)))
+            for key in self.request.query_params
+        )
+        return 'recipe-list:{}'.format(
+            make_etag(
+                self.request.build_absolute_uri(self.request.path),
+                params,
+                user.id,
+                # The versions of the paginated count are part of the key,
+                # so a response is never cached with an outdated count.
+                *(
+                    get_version(name)
+                    for name in self.get_count_version_names()
+                ),
+                get_version(User._meta.label_lower),
+                self.get_ordering_version(ordering),
+            )
+        )
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_list_cache_key()
+        cached = cache.get(cache_key)
+        if cached is None:
+            response = self.get_conditional_response(super().list, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(
+                    cache_key,
+                    (response['ETag'], response.data),
+                    self.user_list_cache_timeout
+                    if request.user.is_authenticated
+                    else self.list_cache_timeout,
+                )
+            return response
+        etag, data = cached
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().retrieve, **kwargs)
+
     @staticmethod
     def destroy_shopping_cart_favorite(id_to_delete, user, model):
         recipe_to_delete = get_object_or_404(Recipe, id=id_to_delete)
@@ -107,20 +232,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.destroy_shopping_cart_favorite(pk, request.user, Favourite)
 
     @staticmethod
-    def create_return_cart_file(queryset):
-        shopping_cart_file_contents = ''
-        for cart_data in queryset:
-            shopping_cart_file_contents += (
-                f'• {cart_data["ingredient__name"]}'
-                f'({cart_data["ingredient__measurement_unit"]})'
-                f' - {cart_data["total_amount"]}\n'
-            )
+    @atomic
+    def bulk_shopping_cart_favorite(request, model):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results = model.objects.bulk_add(request.user, recipe_ids)
+            bump_version(f'user-flags:{request.user.id}')
+            if model is Favourite:
+                bump_version('recipe-ordering:popular')
+            # bulk_create does not send the signals that keep the cart
+            # totals in sync.
+            if model is ShoppingCart:
+                ShoppingCartIngredient.objects.refresh_totals(
+                    (request.user.id,),
+                    RecipeIngredient.objects.filter(
+                        recipe__in=[
+                            pk for pk, result in results.items()
+                            if result == 'added'
+                        ]
+                    ).values('ingredient'),
+                )
+        else:
+            results = model.objects.bulk_remove(request.user, recipe_ids)
+        return Response(
+            {
+                'results': [
+                    {'id': pk, 'result': result}
+                    for pk, result in results.items()
+                ]
+            }
+        )
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/bulk',
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_shopping_cart_favorite(request, ShoppingCart)
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_delete_from_shopping_cart(self, request):
+        return self.bulk_shopping_cart_favorite(request, ShoppingCart)
 
-        response = HttpResponse(
-            shopping_cart_file_contents, content_type='text/plain'
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite/bulk',
+    )
+    def bulk_favorite(self, request):
+        return self.bulk_shopping_cart_favorite(request, Favourite)
+
+    @bulk_favorite.mapping.delete
+    def bulk_delete_from_favorite(self, request):
+        return self.bulk_shopping_cart_favorite(request, Favourite)
+
+    @staticmethod
+    def create_return_cart_file(queryset, exporter_class):
+        exporter = exporter_class()
+        response = StreamingHttpResponse(
+            exporter.stream(queryset.iterator()),
+            content_type=exporter.content_type,
         )
         response['Content-Disposition'] = (
-            'attachment; filename=\'shopping_list.txt\''
+            f'attachment; filename=\'shopping_list.{exporter.extension}\''
         )
 
         return response
@@ -132,19 +311,69 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        cart_data = (
-            RecipeIngredient.objects.filter(
-                recipe__shoppingcart__author=request.user
+        exporter_class = SHOPPING_CART_EXPORTERS.get(
+            request.query_params.get('file_format', 'txt')
+        )
+        if exporter_class is None:
+            return Response(
+                {'detail': 'unsupported file format'},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        cart_data = (
+            ShoppingCartIngredient.objects.filter(author=request.user)
             .values(
                 'ingredient__name',
                 'ingredient__measurement_unit',
+                'total_amount',
             )
-            .annotate(total_amount=Sum('amount'))
             .order_by('ingredient__name')
         )
 
-        return self.create_return_cart_file(cart_data)
+        return self.create_return_cart_file(cart_data, exporter_class)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='pantry',
+    )
+    def get_pantry_recipes(self, request):
+        try:
+            ingredient_ids = {
+                int(ingredient_id)
+                for ingredient_id in request.query_params.getlist(
+                    'ingredients'
+                )
+            }
+        except ValueError:
+            return Response(
+                {'detail': 'ingredients should be ingredient ids'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ingredient_ids:
+            return Response(
+                {'detail': 'ingredients are required'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        paginator = PageNumberWithLimitPagination()
+        ranked_recipes = paginator.paginate_queryset(
+            pantry_search.search(ingredient_ids), request, self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in ranked_recipes]
+        )
+        found_recipes = []
+        for recipe_id, coverage in ranked_recipes:
+            # The index is rebuilt in the background and may still list
+            # deleted recipes.
+            if recipe_id in recipes:
+                recipes[recipe_id].coverage = coverage
+                found_recipes.append(recipes[recipe_id])
+        serializer = PantryRecipeSerializer(
+            found_recipes,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
@@ -152,19 +381,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='get-link',
     )
     def get_short_link(self, request, pk):
-        shortener = pyshorteners.Shortener()
-        short_url = shortener.tinyurl.short(
-            request.build_absolute_uri()
-            .replace('/api', '')
-            .replace('/get-link', '')
+        cache_key = f'short-link-code:{pk}'
+        code = cache.get(cache_key)
+        if code is None:
+            recipe = get_object_or_404(Recipe, id=pk)
+            code = ShortLink.objects.get_or_create_for_recipe(recipe.id).code
+            cache.set(cache_key, code, SHORT_LINK_CACHE_TIMEOUT)
+        short_url = request.build_absolute_uri(
+            reverse('short-link', args=(code,))
         )
         return Response({'short-link': short_url})
 
 
+def redirect_short_link(request, code):
+    cache_key = f'short-link-recipe:{code}'
+    recipe_id = cache.get(cache_key)
+    if recipe_id is None:
+        recipe_id = get_object_or_404(ShortLink, code=code).recipe_id
+        cache.set(cache_key, recipe_id, SHORT_LINK_CACHE_TIMEOUT)
+    return redirect(f'/recipes/{recipe_id}/')
+
+
 class BaseTagIngredientViewSet(viewsets.ModelViewSet):
     http_method_names = ('get',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return reference_cache.get_response(
+            request,
+            self.queryset.model._meta.label_lower,
+            lambda: JSONRenderer().render(
+                self.get_serializer(self.get_queryset(), many=True).data
+            ),
+        )
+
 
 class TagViewSet(BaseTagIngredientViewSet):
     queryset = Tag.objects.all()
@@ -186,6 +438,12 @@ class UserViewSet(DjoserUserViewSet):
         'delete',
     )
 
+    def get_queryset(self):
+        return super().get_queryset().get_is_subscribed(self.request.user)
+
+    def get_count_version_names(self):
+        return (User._meta.label_lower, f'user-flags:{self.request.user.id}')
+
     def get_permissions(self):
         if self.action == 'me':
             return (IsAuthenticated(),)
@@ -198,12 +456,21 @@ class UserViewSet(DjoserUserViewSet):
         url_path='subscriptions',
     )
     def get_my_subscriptions(self, request):
-        subscribed_to_users = request.user.is_subscribed.all()
-        paginator = LimitOffsetPagination()
+        subscribed_to_users = request.user.is_subscribed.get_is_subscribed(
+            request.user
+        ).annotate(recipes_count=Count('recipes'))
+        paginator = CachedCountLimitOffsetPagination()
         paginated_users = paginator.paginate_queryset(
-            subscribed_to_users, request
+            subscribed_to_users, request, self
         )
         recipes_limit = request.query_params.get('recipes_limit')
+        recipes_by_author = defaultdict(list)
+        for recipe in Recipe.objects.filter(
+            author__in=paginated_users
+        ).get_limited_per_author(recipes_limit):
+            recipes_by_author[recipe.author_id].append(recipe)
+        for user in paginated_users:
+            user.limited_recipes = recipes_by_author[user.id]
         serializer = SubscriptionReadSerializer(
             paginated_users,
             many=True,
@@ -248,6 +515,35 @@ class UserViewSet(DjoserUserViewSet):
         serializer.save()
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='subscribe/bulk',
+    )
+    @atomic
+    def bulk_subscribe(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results = Subscribe.objects.bulk_add(request.user, user_ids)
+            bump_version(f'user-flags:{request.user.id}')
+        else:
+            results = Subscribe.objects.bulk_remove(request.user, user_ids)
+        return Response(
+            {
+                'results': [
+                    {'id': pk, 'result': result}
+                    for pk, result in results.items()
+                ]
+            }
+        )
+
+    @bulk_subscribe.mapping.delete
+    def bulk_delete_subscriptions(self, request):
+        return self.bulk_subscribe(request)
+
     @subscribe.mapping.delete
     def delete_subscription(self, request, id):
         get_object_or_404(User, id=id)
@@ -1,8 +1,8 @@
 from django.contrib import admin
-from django.db.models.aggregates import Count
 
 from .models import (Favourite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     RecipeRank, ShoppingCart, ShoppingCartIngredient,
+                     ShortLink, Tag)
 
 admin.site.empty_value_display = 'нет данных'
 admin.site.site_title = 'Админ-зона проекта Foodgram'
@@ -38,6 +38,13 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     search_field = ('author',)
 
 
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('author', 'ingredient', 'total_amount')
+    list_filter = ('author',)
+    search_field = ('author',)
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'favorited')
@@ -46,13 +53,11 @@ class RecipeAdmin(admin.ModelAdmin):
     search_field = ('name',)
     inlines = (RecipeIngredientInline,)
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(favorited=Count('favourites'))
-
-    @admin.display(description='Добавлено в избранное')
+    @admin.display(
+        description='Добавлено в избранное', ordering='favorites_count'
+    )
     def favorited(self, obj):
-        return obj.favorited
+        return obj.favorites_count
 
 
 @admin.register(Favourite)
@@ -62,6 +67,17 @@ class FavoriteAdmin(admin.ModelAdmin):
     search_field = ('author',)
 
 
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    list_display = ('code', 'recipe')
+    search_field = ('code',)
+
+
+@admin.register(RecipeRank)
+class RecipeRankAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'trending_score')
+
+
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient')
@@ -7,3 +7,13 @@ MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32676
 MIN_INGREDIENT_AMOUNT = 1
 MAX_INGREDIENT_AMOUNT = 32676
+MAX_SHORT_LINK_CODE_LENGTH = 16
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+MAX_INGREDIENT_SEARCH_RESULTS = 50
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+TRENDING_PERIOD_DAYS = 7
+TRENDING_HALF_LIFE_DAYS = 2
+SEARCH_CONFIG = 'russian'
+MAX_BULK_ITEMS = 100
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TIMEOUT = 60 * 5
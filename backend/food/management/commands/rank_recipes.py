@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_version
+from food import constants
+from food.models import RecipeRank
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the time-decayed trending scores of recipes. '
+        'Meant to be run periodically, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=constants.TRENDING_PERIOD_DAYS,
+            help='Only count favourites added in the last N days.',
+        )
+        parser.add_argument(
+            '--half-life',
+            type=float,
+            default=constants.TRENDING_HALF_LIFE_DAYS,
+            help='Days after which a favourite weighs half as much.',
+        )
+
+    def handle(self, *args, **options):
+        ranked = RecipeRank.objects.refresh_scores(
+            options['days'], options['half_life']
+        )
+        bump_version('recipe-ordering:trending')
+        self.stdout.write(self.style.SUCCESS(f'{ranked} recipes ranked'))
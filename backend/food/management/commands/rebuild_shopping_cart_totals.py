@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-user shopping cart ingredient totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare stored totals with the live aggregate.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            ShoppingCartIngredient.objects.refresh_totals()
+            self.stdout.write(self.style.SUCCESS('Totals rebuilt'))
+            return
+
+        live_totals = {
+            (total['recipe__shoppingcart__author'], total['ingredient']): (
+                total['total_amount']
+            )
+            for total in ShoppingCartIngredient.objects.get_live_totals()
+        }
+        stored_totals = {
+            (total['author'], total['ingredient']): total['total_amount']
+            for total in ShoppingCartIngredient.objects.values(
+                'author', 'ingredient', 'total_amount'
+            )
+        }
+        mismatches = {
+            key
+            for key in live_totals.keys() | stored_totals.keys()
+            if live_totals.get(key) != stored_totals.get(key)
+        }
+        for author, ingredient in sorted(mismatches):
+            self.stdout.write(
+                f'author {author}, ingredient {ingredient}: '
+                f'stored {stored_totals.get((author, ingredient))}, '
+                f'live {live_totals.get((author, ingredient))}'
+            )
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} totals are out of date')
+        self.stdout.write(self.style.SUCCESS('Totals are up to date'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from food.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recount favourites and shopping carts stored on recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report recipes with out of date counters.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = list(Recipe.objects.get_counter_mismatches())
+        for recipe in recipes:
+            self.stdout.write(
+                f'{recipe.id}: favorites {recipe.favorites_count} -> '
+                f'{recipe.actual_favorites_count}, carts '
+                f'{recipe.in_carts_count} -> {recipe.actual_in_carts_count}'
+            )
+            recipe.favorites_count = recipe.actual_favorites_count
+            recipe.in_carts_count = recipe.actual_in_carts_count
+        if not options['dry_run']:
+            Recipe.objects.bulk_update(
+                recipes, ('favorites_count', 'in_carts_count')
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(recipes)} recipes out of date')
+        )
@@ -0,0 +1,82 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_cart_totals(apps, schema_editor):
+    RecipeIngredient = apps.get_model('food', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model('food', 'ShoppingCartIngredient')
+    totals = (
+        RecipeIngredient.objects.exclude(recipe__shoppingcart__author=None)
+        .values('recipe__shoppingcart__author', 'ingredient')
+        .annotate(total_amount=models.Sum('amount'))
+        .order_by()
+    )
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(
+            author_id=total['recipe__shoppingcart__author'],
+            ingredient_id=total['ingredient'],
+            total_amount=total['total_amount'],
+        )
+        for total in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('food', '0016_auto_20240612_2028'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('total_amount', models.PositiveIntegerField()),
+                (
+                    'author',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='shoppingcart_ingredients',
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    'ingredient',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='shoppingcart_ingredients',
+                        to='food.ingredient',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Ингредиент корзины покупок',
+                'verbose_name_plural': 'Ингредиенты корзин покупок',
+                'ordering': ('author',),
+                'default_related_name': 'shoppingcart_ingredients',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(
+                fields=('author', 'ingredient'),
+                name='unique-together-author-ingredient-in-cart',
+            ),
+        ),
+        migrations.RunPython(
+            fill_shopping_cart_totals, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:30
+
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS food_ingredient_name_upper_trgm '
+        'ON food_ingredient USING gin (UPPER(name::text) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS food_ingredient_name_upper_trgm'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0018_shortlink'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
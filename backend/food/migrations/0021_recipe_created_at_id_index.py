@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0020_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={
+                'ordering': ('created_at', 'id'),
+                'verbose_name': 'Рецепт',
+                'verbose_name_plural': 'Рецепты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['created_at', 'id'], name='recipe-created-at-id-idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:35
+
+from django.db import migrations, models
+import food.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0021_recipe_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(
+                blank=True,
+                default=None,
+                null=True,
+                storage=food.storage.ContentAddressedStorage(),
+                upload_to='api/images/',
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0022_content_addressed_image'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX food_recipe_tags_tag_id_recipe_id_idx '
+            'ON food_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX food_recipe_tags_tag_id_recipe_id_idx',
+        ),
+    ]
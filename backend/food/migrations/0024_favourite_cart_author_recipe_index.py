@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0023_recipe_tags_tag_recipe_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(
+                fields=['author', 'recipe'], name='favourite-author-recipe-idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(
+                fields=['author', 'recipe'], name='cart-author-recipe-idx'
+            ),
+        ),
+    ]
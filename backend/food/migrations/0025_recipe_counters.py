@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:37
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_recipe_counters(apps, schema_editor):
+    Recipe = apps.get_model('food', 'Recipe')
+    Favourite = apps.get_model('food', 'Favourite')
+    ShoppingCart = apps.get_model('food', 'ShoppingCart')
+    for model, counter in (
+        (Favourite, 'favorites_count'),
+        (ShoppingCart, 'in_carts_count'),
+    ):
+        Recipe.objects.update(
+            **{
+                counter: Coalesce(
+                    models.Subquery(
+                        model.objects.filter(recipe=models.OuterRef('pk'))
+                        .values('recipe')
+                        .annotate(count=models.Count('pk'))
+                        .values('count')
+                    ),
+                    0,
+                )
+            }
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0024_favourite_cart_author_recipe_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_recipe_counters, migrations.RunPython.noop),
+    ]
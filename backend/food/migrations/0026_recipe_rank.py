@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0025_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRank',
+            fields=[
+                (
+                    'recipe',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='rank',
+                        serialize=False,
+                        to='food.recipe',
+                    ),
+                ),
+                ('trending_score', models.FloatField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+                'ordering': ('-trending_score',),
+            },
+        ),
+        migrations.AddField(
+            model_name='favourite',
+            name='created_at',
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['favorites_count', 'created_at', 'id'],
+                name='recipe-favorites-count-idx',
+            ),
+        ),
+    ]
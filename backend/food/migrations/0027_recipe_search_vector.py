@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:41
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE food_recipe SET search_vector = "
+        "setweight(to_tsvector('russian', COALESCE(name, '')), 'A') || "
+        "setweight(to_tsvector('russian', COALESCE(("
+        "SELECT string_agg(food_ingredient.name, ' ') "
+        "FROM food_recipeingredient JOIN food_ingredient "
+        "ON food_ingredient.id = food_recipeingredient.ingredient_id "
+        "WHERE food_recipeingredient.recipe_id = food_recipe.id"
+        "), '')), 'B') || "
+        "setweight(to_tsvector('russian', COALESCE(text, '')), 'C')"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS food_recipe_search_vector_gin '
+        'ON food_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS food_recipe_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0026_recipe_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(fill_search_vectors, drop_search_index),
+    ]
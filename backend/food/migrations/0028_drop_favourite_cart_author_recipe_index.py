@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0027_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='favourite',
+            name='favourite-author-recipe-idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='shoppingcart',
+            name='cart-author-recipe-idx',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0028_drop_favourite_cart_author_recipe_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reciperank',
+            name='ranked_at',
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+    ]
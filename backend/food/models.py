@@ -1,10 +1,22 @@
+from collections import defaultdict
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db import connection, models
+from django.db.models import (Count, Exists, F, Max, OuterRef, Prefetch,
+                              Subquery, Sum, Window)
+from django.db.models.functions import Coalesce, RowNumber
 from django.db.models.query import QuerySet
+from django.db.transaction import atomic
+from django.utils import timezone
 
 from food import constants
+from food.querysets import UserFlagQuerySet
+from food.storage import content_addressed_storage
+from food.utils import get_bulk_add_results, get_bulk_remove_results, to_base62
 
 User = get_user_model()
 
@@ -47,27 +59,101 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class RecipeQuerySet(QuerySet):
+class RecipeQuerySet(UserFlagQuerySet):
     def get_is_favorited_is_in_shopping_cart(self, request_user):
-        if request_user.is_authenticated:
-            self = self.annotate(
-                is_favorited=Exists(
-                    Favourite.objects.filter(
-                        author=request_user, recipe=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        author=request_user, recipe=OuterRef('pk')
-                    )
-                ),
+        return self.annotate_user_flags(
+            request_user,
+            is_favorited=lambda user: Favourite.objects.filter(
+                author=user, recipe=OuterRef('pk')
+            ),
+            is_in_shopping_cart=lambda user: ShoppingCart.objects.filter(
+                author=user, recipe=OuterRef('pk')
+            ),
+        )
+
+    def get_read_related(self, request_user):
+        return self.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.get_is_subscribed(request_user),
+            ),
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
+
+    def get_counter_mismatches(self):
+        return self.annotate(
+            actual_favorites_count=Count('favourites', distinct=True),
+            actual_in_carts_count=Count('shoppingcart', distinct=True),
+        ).exclude(
+            favorites_count=F('actual_favorites_count'),
+            in_carts_count=F('actual_in_carts_count'),
+        )
+
+    def refresh_counter(self, model):
+        return self.update(
+            **{
+                model.recipe_counter: Coalesce(
+                    Subquery(
+                        model.objects.filter(recipe=OuterRef('pk'))
+                        .order_by()
+                        .values('recipe')
+                        .annotate(count=Count('pk'))
+                        .values('count')
+                    ),
+                    0,
+                )
+            }
+        )
+
+    def get_limited_per_author(self, limit):
+        if not limit:
+            return self
+        ranked = self.annotate(
+            author_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('created_at').asc(), F('id').asc()),
             )
-        else:
-            self = self.annotate(
-                is_favorited=Exists(Favourite.objects.none()),
-                is_in_shopping_cart=Exists(ShoppingCart.objects.none()),
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) AS ranked '
+            'WHERE ranked.author_rank <= %s '
+            'ORDER BY ranked.author_rank',
+            (*params, int(limit)),
+        )
+
+    def refresh_search_vectors(self):
+        if connection.vendor != 'postgresql':
+            return
+        ingredient_names = (
+            RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(names=StringAgg('ingredient__name', ' '))
+            .values('names')
+        )
+        self.update(
+            search_vector=(
+                SearchVector(
+                    'name', weight='A', config=constants.SEARCH_CONFIG
+                )
+                + SearchVector(
+                    Subquery(
+                        ingredient_names, output_field=models.TextField()
+                    ),
+                    weight='B',
+                    config=constants.SEARCH_CONFIG,
+                )
+                + SearchVector(
+                    'text', weight='C', config=constants.SEARCH_CONFIG
+                )
             )
-        return self
+        )
 
 
 class Recipe(models.Model):
@@ -90,16 +176,33 @@ class Recipe(models.Model):
         Ingredient, through='RecipeIngredient'
     )
     image = models.ImageField(
-        upload_to='api/images/', null=True, default=None, blank=True
+        upload_to='api/images/',
+        storage=content_addressed_storage,
+        null=True,
+        default=None,
+        blank=True,
     )
     author = models.ForeignKey(
         User, related_name='recipes', on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(default=0)
+    in_carts_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('created_at',)
+        ordering = ('created_at', 'id')
+        indexes = (
+            models.Index(
+                fields=('created_at', 'id'), name='recipe-created-at-id-idx'
+            ),
+            models.Index(
+                fields=('favorites_count', 'created_at', 'id'),
+                name='recipe-favorites-count-idx',
+            ),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -107,15 +210,74 @@ class Recipe(models.Model):
         return self.name
 
 
+class ShortLinkQuerySet(QuerySet):
+    def get_or_create_for_recipe(self, recipe_id):
+        short_link, _ = self.get_or_create(
+            recipe_id=recipe_id, defaults={'code': to_base62(recipe_id)}
+        )
+        return short_link
+
+
+class ShortLink(models.Model):
+    recipe = models.OneToOneField(
+        Recipe, related_name='short_link', on_delete=models.CASCADE
+    )
+    code = models.CharField(
+        unique=True, max_length=constants.MAX_SHORT_LINK_CODE_LENGTH
+    )
+    objects = ShortLinkQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self) -> str:
+        return f'{self.code} leads to {self.recipe.name}'
+
+
+class RecipeAuthorQuerySet(QuerySet):
+    @atomic
+    def bulk_add(self, author, recipe_ids):
+        # Every add of the author holds this lock, so the flags read below
+        # stay accurate until the commit.
+        User.objects.filter(pk=author.pk).lock()
+        recipes = dict(
+            Recipe.objects.filter(pk__in=recipe_ids)
+            .annotate(
+                is_added=Exists(
+                    self.filter(author=author, recipe=OuterRef('pk'))
+                )
+            )
+            .values_list('id', 'is_added')
+        )
+        added_ids = {pk for pk, is_added in recipes.items() if not is_added}
+        self.bulk_create(
+            self.model(author=author, recipe_id=pk) for pk in added_ids
+        )
+        Recipe.objects.filter(pk__in=added_ids).refresh_counter(self.model)
+        return get_bulk_add_results(recipe_ids, recipes, added_ids)
+
+    @atomic
+    def bulk_remove(self, author, recipe_ids):
+        removed = self.filter(author=author, recipe__in=recipe_ids)
+        removed_ids = set(removed.values_list('recipe', flat=True))
+        removed.delete()
+        return get_bulk_remove_results(recipe_ids, removed_ids)
+
+
 class RecipeAuthorBaseModel(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    objects = RecipeAuthorQuerySet.as_manager()
 
     class Meta:
         abstract = True
 
 
 class Favourite(RecipeAuthorBaseModel):
+    created_at = models.DateTimeField(auto_now_add=True)
+    recipe_counter = 'favorites_count'
+
     class Meta:
         ordering = ('author',)
         verbose_name = 'Избранное'
@@ -133,6 +295,8 @@ class Favourite(RecipeAuthorBaseModel):
 
 
 class ShoppingCart(RecipeAuthorBaseModel):
+    recipe_counter = 'in_carts_count'
+
     class Meta:
         ordering = ('author',)
         verbose_name = 'Корзина покупок'
@@ -186,3 +350,114 @@ class RecipeIngredient(models.Model):
             f'Recipe {self.recipe.name} has the ingredient '
             f'{self.ingredient.name} with an amount: {self.amount}'
         )
+
+
+class ShoppingCartIngredientQuerySet(QuerySet):
+    @staticmethod
+    def get_live_totals(authors=None, ingredients=None):
+        totals = RecipeIngredient.objects.all()
+        if authors is not None:
+            totals = totals.filter(recipe__shoppingcart__author__in=authors)
+        if ingredients is not None:
+            totals = totals.filter(ingredient__in=ingredients)
+        return (
+            totals.values('recipe__shoppingcart__author', 'ingredient')
+            .annotate(total_amount=Sum('amount'))
+            .exclude(recipe__shoppingcart__author=None)
+            .order_by()
+        )
+
+    @atomic
+    def refresh_totals(self, authors=None, ingredients=None):
+        stale = self.all()
+        if authors is not None:
+            # Concurrent refreshes of the same author would otherwise
+            # insert rows the other one has just committed.
+            User.objects.filter(pk__in=authors).lock()
+            stale = stale.filter(author__in=authors)
+        if ingredients is not None:
+            stale = stale.filter(ingredient__in=ingredients)
+        stale.delete()
+        self.bulk_create(
+            ShoppingCartIngredient(
+                author_id=total['recipe__shoppingcart__author'],
+                ingredient_id=total['ingredient'],
+                total_amount=total['total_amount'],
+            )
+            for total in self.get_live_totals(authors, ingredients)
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    author = models.ForeignKey(User, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    total_amount = models.PositiveIntegerField()
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('author',)
+        verbose_name = 'Ингредиент корзины покупок'
+        verbose_name_plural = 'Ингредиенты корзин покупок'
+        default_related_name = 'shoppingcart_ingredients'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('author', 'ingredient'),
+                name='unique-together-author-ingredient-in-cart',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return (
+            f'{self.author.username} needs {self.total_amount} '
+            f'of {self.ingredient.name}'
+        )
+
+
+class RecipeRankQuerySet(QuerySet):
+    @staticmethod
+    def get_trending_scores(period_days, half_life_days, now=None):
+        now = now or timezone.now()
+        scores = defaultdict(float)
+        favourites = Favourite.objects.filter(
+            created_at__gte=now - timedelta(days=period_days)
+        ).values_list('recipe_id', 'created_at')
+        for recipe_id, created_at in favourites.order_by().iterator():
+            age_days = (now - created_at).total_seconds() / 86400
+            scores[recipe_id] += 0.5 ** (age_days / half_life_days)
+        return scores
+
+    @atomic
+    def refresh_scores(self, period_days, half_life_days):
+        scores = self.get_trending_scores(period_days, half_life_days)
+        ranked_at = timezone.now()
+        self.all().delete()
+        self.bulk_create(
+            RecipeRank(
+                recipe_id=recipe_id, trending_score=score, ranked_at=ranked_at
+            )
+            for recipe_id, score in scores.items()
+        )
+        return len(scores)
+
+    def get_ranked_at(self):
+        return self.aggregate(ranked_at=Max('ranked_at'))['ranked_at']
+
+
+class RecipeRank(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name='rank',
+        on_delete=models.CASCADE,
+    )
+    trending_score = models.FloatField(db_index=True)
+    ranked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    objects = RecipeRankQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-trending_score',)
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self) -> str:
+        return f'{self.recipe.name} has trending score {self.trending_score}'
@@ -0,0 +1,19 @@
+from django.db.models import BooleanField, Exists, Value
+from django.db.models.query import QuerySet
+
+
+class UserFlagQuerySet(QuerySet):
+    def annotate_user_flags(self, request_user, **flags):
+        if not request_user.is_authenticated:
+            return self.annotate(
+                **{
+                    name: Value(False, output_field=BooleanField())
+                    for name in flags
+                }
+            )
+        return self.annotate(
+            **{
+                name: Exists(get_flag_queryset(request_user))
+                for name, get_flag_queryset in flags.items()
+            }
+        )
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from food.models import (Favourite, Ingredient, Recipe, RecipeIngredient,
+                         ShoppingCart, ShoppingCartIngredient)
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        counter = sender.recipe_counter
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            **{counter: F(counter) + 1}
+        )
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    counter = sender.recipe_counter
+    Recipe.objects.filter(
+        pk=instance.recipe_id, **{f'{counter}__gt': 0}
+    ).update(**{counter: F(counter) - 1})
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_recipes_search(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            recipe_ingredients__ingredient=instance
+        ).refresh_search_vectors()
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search(sender, instance, **kwargs):
+    # A new recipe is saved before its ingredients are bulk-created, which
+    # sends no signals, so the vector is refreshed once they are written.
+    recipes = Recipe.objects.filter(pk=instance.pk)
+    transaction.on_commit(recipes.refresh_search_vectors)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_recipe_ingredient_search(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).refresh_search_vectors()
+
+
+def get_recipe_ingredient_ids(recipe_id):
+    return list(
+        RecipeIngredient.objects.filter(recipe=recipe_id).values_list(
+            'ingredient', flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        ShoppingCartIngredient.objects.refresh_totals(
+            (instance.author_id,),
+            get_recipe_ingredient_ids(instance.recipe_id),
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remember_cart_ingredients(sender, instance, **kwargs):
+    # On a cascade delete the recipe ingredients may already be gone when
+    # post_delete is sent.
+    instance.cart_ingredient_ids = get_recipe_ingredient_ids(
+        instance.recipe_id
+    )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_cart_totals(sender, instance, **kwargs):
+    ShoppingCartIngredient.objects.refresh_totals(
+        (instance.author_id,), instance.cart_ingredient_ids
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_recipe_ingredient_cart_totals(sender, instance, **kwargs):
+    ShoppingCartIngredient.objects.refresh_totals(
+        ShoppingCart.objects.filter(recipe=instance.recipe_id).values(
+            'author'
+        ),
+        (instance.ingredient_id,),
+    )
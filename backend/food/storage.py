@@ -0,0 +1,37 @@
+import os
+import posixpath
+from hashlib import sha256
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_content_name(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        name = self.get_content_name(name, content)
+        try:
+            # A reused file must look fresh to collect_media_garbage, which
+            # skips files younger than --min-age.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return super().save(name, content, max_length)
+        return name
+
+    def delete(self, name):
+        pass
+
+    def purge(self, name):
+        super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
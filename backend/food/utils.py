@@ -0,0 +1,28 @@
+import string
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+
+def to_base62(number):
+    if number == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while number:
+        number, remainder = divmod(number, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[remainder])
+    return ''.join(reversed(digits))
+
+
+def get_bulk_add_results(ids, found, added):
+    return {
+        pk: (
+            'added' if pk in added
+            else 'exists' if pk in found
+            else 'not_found'
+        )
+        for pk in ids
+    }
+
+
+def get_bulk_remove_results(ids, removed):
+    return {pk: 'removed' if pk in removed else 'missing' for pk in ids}
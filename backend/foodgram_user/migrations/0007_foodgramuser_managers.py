@@ -0,0 +1,20 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:23
+
+from django.db import migrations
+import foodgram_user.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram_user', '0006_alter_foodgramuser_is_subscribed'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='foodgramuser',
+            managers=[
+                ('objects', foodgram_user.models.FoodgramUserManager()),
+            ],
+        ),
+    ]
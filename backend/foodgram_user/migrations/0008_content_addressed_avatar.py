@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-18 02:35
+
+from django.db import migrations, models
+import food.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram_user', '0007_foodgramuser_managers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodgramuser',
+            name='avatar',
+            field=models.ImageField(
+                default=None,
+                null=True,
+                storage=food.storage.ContentAddressedStorage(),
+                upload_to='api/images/',
+            ),
+        ),
+    ]
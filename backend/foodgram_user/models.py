@@ -1,15 +1,50 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models import F, Q
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import connections, models
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.query import QuerySet
+from django.db.transaction import atomic
 
+from food.querysets import UserFlagQuerySet
+from food.storage import content_addressed_storage
+from food.utils import get_bulk_add_results, get_bulk_remove_results
 from foodgram_user.constants import MAX_NAME_LENGTH
 
 
+class FoodgramUserQuerySet(UserFlagQuerySet):
+    def lock(self):
+        # FOR NO KEY UPDATE serializes the writes of these users without
+        # blocking inserts of rows that reference them. Backends without
+        # row locks skip the query: a read before the first write only
+        # makes SQLite fail to upgrade its lock.
+        if not connections[self.db].features.has_select_for_update:
+            return []
+        return list(
+            self.select_for_update(no_key=True)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def get_is_subscribed(self, request_user):
+        return self.annotate_user_flags(
+            request_user,
+            subscribed=lambda user: Subscribe.objects.filter(
+                user=user, subscription=OuterRef('pk')
+            ),
+        )
+
+
+class FoodgramUserManager(UserManager.from_queryset(FoodgramUserQuerySet)):
+    pass
+
+
 class FoodgramUser(AbstractUser):
     first_name = models.CharField(max_length=MAX_NAME_LENGTH)
     last_name = models.CharField(max_length=MAX_NAME_LENGTH)
     avatar = models.ImageField(
-        upload_to='api/images/', null=True, default=None
+        upload_to='api/images/',
+        storage=content_addressed_storage,
+        null=True,
+        default=None,
     )
     is_subscribed = models.ManyToManyField(
         'self',
@@ -19,6 +54,7 @@ class FoodgramUser(AbstractUser):
         through='Subscribe',
     )
     email = models.EmailField(unique=True)
+    objects = FoodgramUserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('last_name', 'first_name', 'username')
@@ -32,11 +68,42 @@ class FoodgramUser(AbstractUser):
         return self.username
 
 
+class SubscribeQuerySet(QuerySet):
+    @atomic
+    def bulk_add(self, user, subscription_ids):
+        FoodgramUser.objects.filter(pk=user.pk).lock()
+        subscriptions = dict(
+            FoodgramUser.objects.filter(pk__in=subscription_ids)
+            .exclude(pk=user.pk)
+            .annotate(
+                is_added=Exists(
+                    self.filter(user=user, subscription=OuterRef('pk'))
+                )
+            )
+            .values_list('id', 'is_added')
+        )
+        added_ids = {
+            pk for pk, is_added in subscriptions.items() if not is_added
+        }
+        self.bulk_create(
+            self.model(user=user, subscription_id=pk) for pk in added_ids
+        )
+        return get_bulk_add_results(subscription_ids, subscriptions, added_ids)
+
+    @atomic
+    def bulk_remove(self, user, subscription_ids):
+        removed = self.filter(user=user, subscription__in=subscription_ids)
+        removed_ids = set(removed.values_list('subscription', flat=True))
+        removed.delete()
+        return get_bulk_remove_results(subscription_ids, removed_ids)
+
+
 class Subscribe(models.Model):
     user = models.ForeignKey(
         FoodgramUser, related_name='subscription', on_delete=models.CASCADE
     )
     subscription = models.ForeignKey(FoodgramUser, on_delete=models.CASCADE)
+    objects = SubscribeQuerySet.as_manager()
 
     class Meta:
         constraints = (